@@ -5,6 +5,7 @@ Lightweight Ollama client.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import subprocess
 import os
@@ -14,6 +15,12 @@ OLLAMA_BASE_URL = "http://localhost:11434"
 CHAT_ENDPOINT = f"{OLLAMA_BASE_URL}/api/chat"
 GENERATE_ENDPOINT = f"{OLLAMA_BASE_URL}/api/generate"
 
+# One shared session: keep-alive connections to the local Ollama server are reused
+# instead of opening a fresh TCP connection per request. Pool sized for the
+# concurrent window prompts fired by the segmenter.
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
 # NOTE: CHANGE THIS FOR WINDOWS!
 # Use "ollama" if callable from PATH.
 # Otherwise, set the full .exe path here.
@@ -35,6 +42,27 @@ def _autopull_model(model: str):
     print(f"processor: [ollama-client] Model '{model}' pulled.")
 
 
+def _collect_stream(response, key_path: tuple[str, ...]) -> str:
+    """
+    Accumulate a streamed Ollama response into a single string.
+    <key_path> locates the token delta in each streamed JSON line
+    (("message", "content") for /api/chat, ("response",) for /api/generate).
+    """
+    buf = []
+    for line in response.iter_lines():
+        if not line:
+            continue
+        chunk = json.loads(line)
+        piece = chunk
+        for key in key_path:
+            piece = piece.get(key, {}) if isinstance(piece, dict) else ""
+        if isinstance(piece, str):
+            buf.append(piece)
+        if chunk.get("done"):
+            break
+    return "".join(buf).strip()
+
+
 def ollama_generate(prompt: str, model: str = "llama3", max_tokens: int = 2048) -> str:
     """
     Interface with ollama API.
@@ -45,10 +73,11 @@ def ollama_generate(prompt: str, model: str = "llama3", max_tokens: int = 2048)
     while True:
         # Attempt to /api/chat.
         try:
-            chat_payload = {"model": model, "stream": False, "messages": [{"role": "user", "content": prompt}]}
-            r = requests.post(CHAT_ENDPOINT, data=json.dumps(chat_payload), headers={"Content-Type": "application/json"})
+            chat_payload = {"model": model, "stream": True, "messages": [{"role": "user", "content": prompt}]}
+            r = _SESSION.post(CHAT_ENDPOINT, json=chat_payload, stream=True)
             if r.status_code == 200:
-                return r.json()["message"]["content"].strip()
+                # Consume tokens as they arrive instead of waiting for the full completion.
+                return _collect_stream(r, ("message", "content"))
             if (r.status_code == 404) and (not tried_autopull):
                 tried_autopull = True
                 _autopull_model(model)
@@ -58,10 +87,10 @@ def ollama_generate(prompt: str, model: str = "llama3", max_tokens: int = 2048)
 
         # Fallback to /api/generate if unsuccessful.
         try:
-            gen_payload = {"model": model, "stream": False, "prompt": prompt, "options": {"num_predict": max_tokens}}
-            r2 = requests.post(GENERATE_ENDPOINT, data=json.dumps(gen_payload), headers={"Content-Type": "application/json"})
+            gen_payload = {"model": model, "stream": True, "prompt": prompt, "options": {"num_predict": max_tokens}}
+            r2 = _SESSION.post(GENERATE_ENDPOINT, json=gen_payload, stream=True)
             if r2.status_code == 200:
-                return r2.json().get("response", "").strip()
+                return _collect_stream(r2, ("response",))
             if (r2.status_code == 404) and (not tried_autopull):
                 tried_autopull = True
                 _autopull_model(model)
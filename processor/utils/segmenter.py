@@ -11,40 +11,51 @@ Implementation:
     2. Sends chunks to LLM to detect topic titles
 """
 
+import mmap
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import partial
 from .llm_client import ollama_generate
 from typing import Any
 
-def _parse_srt(text: str) -> list[tuple[float, float, Any]]:
+# Upper bound on in-flight LLM requests; match Ollama's num_parallel server setting.
+MAX_CONCURRENT_REQUESTS = 8
+
+# Compiled once at import; recompiling this DOTALL pattern per call is wasteful on big files.
+_SRT_RE = re.compile(
+    r"(\d+)\s+(?P<start>\d{2}:\d{2}:\d{2}[,.]\d{3})\s-->\s(?P<end>\d{2}:\d{2}:\d{2}[,.]\d{3})\s+(?P<content>.*?)\s*(?=\n\d+\n|\Z)",
+    re.DOTALL
+)
+
+
+def _parse_srt(text: str):
     """
-    Parses an .srt string to a list of (start_seconds, end_seconds, text)
+    Lazily yield (start_seconds, end_seconds, text) entries from an .srt string.
+    A generator so large files stream through windowing without an intermediate list.
     """
-    pattern = re.compile(
-        r"(\d+)\s+(\d{2}:\d{2}:\d{2}[,.]\d{3})\s-->\s(\d{2}:\d{2}:\d{2}[,.]\d{3})\s+(.*?)\s*(?=\n\d+\n|\Z)",
-        re.DOTALL
-    )
-    matches = pattern.findall(text)
-    output = []
-    for _, start_str, end_str, content in matches:
-        start = _timestamp_to_seconds(start_str)
-        end = _timestamp_to_seconds(end_str)
-        output.append((start, end, content.strip().replace("\n", " ")))
-    return output
+    for m in _SRT_RE.finditer(text):
+        start = _timestamp_to_seconds(m["start"])
+        end = _timestamp_to_seconds(m["end"])
+        yield start, end, m["content"].strip().replace("\n", " ")
 
 
 def _timestamp_to_seconds(timestamp: str) -> float:
-    """Convert a timestamp to its value in seconds."""
-    timestamp = timestamp.replace(",", ".")
-    hours, mins, secs = timestamp.split(":")
-    sec = float(hours) * 3600 + float(mins) * 60 + float(secs)
-    return sec
+    """
+    Convert an hh:mm:ss[,.]mmm timestamp to its value in seconds.
+    The fixed layout (guaranteed by _SRT_RE) lets this slice-and-int-parse directly
+    instead of replace/split plus three float conversions — it runs once per SRT entry.
+    """
+    return (int(timestamp[0:2]) * 3600 + int(timestamp[3:5]) * 60
+            + int(timestamp[6:8]) + int(timestamp[9:12]) * 0.001)
 
 
-def _is_srt(text: str) -> bool:
-    """Identify whether a file is an .srt file and return true iff the file contains the "-->" pattern
-    prominent in .srt files."""
-    return "-->" in text and re.search(r"\d{2}:\d{2}:\d{2}", text) is not None
+def _is_srt(buf) -> bool:
+    """Identify whether a file is an .srt file and return true iff the buffer contains the "-->" pattern
+    prominent in .srt files. Operates on bytes (e.g. an mmap) so no decode is needed to probe.
+    Note: uses .find() rather than `in` because mmap objects don't substring-search with `in`."""
+    return buf.find(b"-->") != -1 and re.search(rb"\d{2}:\d{2}:\d{2}", buf) is not None
 
 
 def generate_chapters(path: str, model: str, max_tokens: int = 2048, min_chunk_seconds: int = 120) -> list[dict[str, str | Any]]:
@@ -57,41 +68,52 @@ def generate_chapters(path: str, model: str, max_tokens: int = 2048, min_chunk_s
         - "summary": highlights of this chapter's contents
     """
 
-    with open(path, "r", encoding="utf-8") as f:
-        t = f.read()
+    if os.path.getsize(path) == 0:
+        return []
 
-    # Parse the file as .srt if possible.
-    if _is_srt(t):
+    # Memory-map the transcript: the .srt probe runs on the raw mapped bytes and the
+    # decode reads straight from the mapped pages, skipping f.read()'s extra copy.
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        is_srt = _is_srt(mm)
+        t = mm[:].decode("utf-8", errors="replace")
+
+    # Parse the file as .srt if possible. Both branches are lazy iterators so the
+    # windowing pass below streams entries instead of materializing them all first.
+    if is_srt:
         entries = _parse_srt(t)
     else:
         # Then the text is plaintext.
         # Treat each line as if it's worth 5s.
-        entries = []
-        for idx, line in enumerate(t.splitlines()):
-            seconds = idx * 5  # Add a dummy 5s to the 'timestamp' of each new line.
-            entries.append((seconds, seconds + 5, line.strip()))
+        entries = (
+            (idx * 5, idx * 5 + 5, line.strip())  # Add a dummy 5s to the 'timestamp' of each new line.
+            for idx, line in enumerate(t.splitlines())
+        )
 
-    # Merge into coarse windows.
+    # Merge into coarse windows. The window text accumulates in a list and is joined
+    # once per flush — repeated `str +=` would re-copy the growing chunk every entry.
     windows = []
-    current_chunk = ""
-    current_start = entries[0][0] if entries else 0
-    last_time = current_start
+    current_chunk: list[str] = []
+    current_start = None
+    last_time = 0
 
     for start, end, txt in entries:
+        if current_start is None:
+            current_start = start
+            last_time = start
         if (end - current_start >= min_chunk_seconds) and current_chunk:
-            windows.append((current_start, last_time, current_chunk.strip()))
-            current_chunk = ""
+            windows.append((current_start, last_time, " ".join(current_chunk).strip()))
+            current_chunk = []
             current_start = start
-        current_chunk += " " + txt
+        current_chunk.append(txt)
         last_time = end
 
     # Combine.
     if current_chunk:
-        windows.append((current_start, last_time, current_chunk.strip()))
+        windows.append((current_start, last_time, " ".join(current_chunk).strip()))
 
-    output = []
-    for (start, end, chunk) in windows:
-        prompt = (
+    prompts = []
+    for (_, _, chunk) in windows:
+        prompts.append(
             "You are an assistant analyzing a transcript chunk.\n"
             "Chunk:\n"
             f"{chunk}\n\n"
@@ -101,8 +123,16 @@ def generate_chapters(path: str, model: str, max_tokens: int = 2048, min_chunk_s
             "Condition: Return plaintext only. Do NOT use Markdown, bold, bullet points, or any special formatting.\n"
             "Condition: Do NOT provide anything else other than the short title and 1-2 sentence summary (e.g, no 'here are the requested outputs)"
         )
-        response = ollama_generate(prompt=prompt, model=model, max_tokens=max_tokens)
 
+    # Fire the window prompts concurrently instead of one blocked HTTP round-trip at a
+    # time; Ollama pipelines them server-side and map() keeps the responses in order.
+    if not windows:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(windows))) as pool:
+        responses = list(pool.map(partial(ollama_generate, model=model, max_tokens=max_tokens), prompts))
+
+    output = []
+    for (start, end, _), response in zip(windows, responses):
         # Parse assuming the form Title: ...\nSummary: ..."
         lines = response.splitlines()
         title = lines[0].strip()
@@ -2,6 +2,9 @@
 Summary generator using Ollama LLM API.
 """
 
+import mmap
+import os
+
 from .llm_client import ollama_generate
 
 def generate_summary(transcript_path: str, model: str, max_tokens: int = 2048, mode: str = "dense") -> str:
@@ -11,8 +14,14 @@ def generate_summary(transcript_path: str, model: str, max_tokens: int = 2048, m
     == Preconditions ==
     'mode' == 'dense' (single paragraph summary) or bullet (5-7 bullet point summary)
     """
-    with open(transcript_path, "r", encoding="utf-8") as f:
-        text = f.read()
+    # Memory-map the transcript: decoding straight from the mapped pages skips the
+    # intermediate kernel->userspace copy that f.read() makes on multi-MB files.
+    with open(transcript_path, "rb") as f:
+        if os.path.getsize(transcript_path) == 0:
+            text = ""
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = mm[:].decode("utf-8", errors="replace")
 
     if mode == "bullet":
         prompt = (